@@ -183,6 +183,11 @@ class Hostapd:
         logger.debug(self.dbg + ": CTRL: " + cmd)
         return self.ctrl.request(cmd)
 
+    def request_batch(self, cmds):
+        for cmd in cmds:
+            logger.debug(self.dbg + ": CTRL: " + cmd)
+        return self.ctrl.request_batch(cmds)
+
     def ping(self):
         return "PONG" in self.request("PING")
 
@@ -241,8 +246,7 @@ class Hostapd:
             raise Exception("Failed to disable hostapd interface " + self.ifname)
 
     def dump_monitor(self):
-        while self.mon.pending():
-            ev = self.mon.recv()
+        for ev in self.mon.recv_pending():
             logger.debug(self.dbg + ": " + ev)
 
     def wait_event(self, events, timeout):
@@ -301,12 +305,21 @@ class Hostapd:
             vals[name] = value
         return vals
 
-    def mgmt_rx(self, timeout=5):
-        ev = self.wait_event(["MGMT-RX"], timeout=timeout)
-        if ev is None:
-            return None
+    def mgmt_rx(self, timeout=5, subtype=None):
+        start = os.times()[4]
+        while True:
+            remaining = start + timeout - os.times()[4]
+            ev = self.wait_event(["MGMT-RX"], timeout=max(remaining, 0))
+            if ev is None:
+                return None
+            frame_hex = ev.split(' ')[1]
+            # Check the subtype from the low octet of the Frame Control field
+            # before doing the full parsing of frames that are not of interest.
+            if subtype is None or \
+               (int(frame_hex[0:2], 16) >> 4) & 0xf == subtype:
+                break
         msg = {}
-        frame = binascii.unhexlify(ev.split(' ')[1])
+        frame = binascii.unhexlify(frame_hex)
         msg['frame'] = frame
 
         hdr = struct.unpack('<HH6B6B6BH', frame[0:24])
@@ -2420,7 +2420,10 @@ def find_wpas_process(dev):
     raise Exception("Could not find wpa_supplicant process")
 
 def read_process_memory(pid, key=None):
-    buf = bytes()
+    # Collect the memory areas into a list and join them once at the end to
+    # avoid copying the already read part on each appended area.
+    chunks = []
+    total = 0
     logger.info("Reading process memory (pid=%d)" % pid)
     with open('/proc/%d/maps' % pid, 'r') as maps, \
          open('/proc/%d/mem' % pid, 'rb') as mem:
@@ -2439,12 +2442,14 @@ def read_process_memory(pid, key=None):
                 continue
             for name in ["[heap]", "[stack]"]:
                 if name in l:
-                    logger.info("%s 0x%x-0x%x is at %d-%d" % (name, start, end, len(buf), len(buf) + (end - start)))
+                    logger.info("%s 0x%x-0x%x is at %d-%d" % (name, start, end, total, total + (end - start)))
             mem.seek(start)
             data = mem.read(end - start)
-            buf += data
+            chunks.append(data)
+            total += len(data)
             if key and key in data:
                 logger.info("Key found in " + l)
+    buf = b''.join(chunks)
     logger.info("Total process memory read: %d bytes" % len(buf))
     return buf
 
@@ -77,7 +77,10 @@ long_tests = ["ap_roam_open",
               "p2p_go_move_scm",
               "p2p_go_move_scm_peer_supports",
               "p2p_go_move_scm_peer_does_not_support",
-              "p2p_go_move_scm_multi"]
+              "p2p_go_move_scm_multi",
+              "sae_bignum_failure_ecc",
+              "sae_bignum_failure_ffc",
+              "sae_anti_clogging_during_attack"]
 
 def get_failed(vm):
     failed = []
@@ -839,19 +839,17 @@ class WpaSupplicant:
 
     def _wait_event(self, mon, pfx, events, timeout):
         start = os.times()[4]
-        while True:
-            while mon.pending():
-                ev = mon.recv()
-                logger.debug(self.dbg + pfx + ev)
-                for event in events:
-                    if event in ev:
-                        return ev
-            now = os.times()[4]
-            remaining = start + timeout - now
-            if remaining <= 0:
-                break
-            if not mon.pending(timeout=remaining):
-                break
+        remaining = timeout
+        # Block in select() until the next event arrives, so that each
+        # received event costs a single select() call. Events that are
+        # already queued are processed even after the timeout has expired.
+        while mon.pending(timeout=max(remaining, 0)):
+            ev = mon.recv()
+            logger.debug(self.dbg + pfx + ev)
+            for event in events:
+                if event in ev:
+                    return ev
+            remaining = start + timeout - os.times()[4]
         return None
 
     def wait_event(self, events, timeout=10):
@@ -10,6 +10,7 @@ import os
 import stat
 import socket
 import select
+import errno
 
 counter = 0
 
@@ -80,17 +81,16 @@ class Ctrl:
                 os.unlink(self.local)
             self.started = False
 
-    def request(self, cmd, timeout=10):
+    def _send(self, cmd):
         if type(cmd) == str:
-            try:
-                cmd2 = cmd.encode()
-                cmd = cmd2
-            except UnicodeDecodeError as e:
-                pass
+            cmd = cmd.encode()
         if self.udp:
             self.s.sendto(self.cookie + cmd, self.sockaddr)
         else:
             self.s.send(cmd)
+
+    def request(self, cmd, timeout=10):
+        self._send(cmd)
         [r, w, e] = select.select([self.s], [], [], timeout)
         if r:
             res = self.s.recv(4096).decode()
@@ -101,6 +101,19 @@ class Ctrl:
             return r
         raise Exception("Timeout on waiting response")
 
+    def request_batch(self, cmds, timeout=10):
+        # Do not reuse the connection for requests after a timeout
+        for cmd in cmds:
+            self._send(cmd)
+        res = []
+        for cmd in cmds:
+            [r, w, e] = select.select([self.s], [], [], timeout)
+            if not r:
+                self.recv_pending()
+                raise Exception("Timeout on waiting response")
+            res.append(self.recv())
+        return res
+
     def attach(self):
         if self.attached:
             return None
@@ -131,6 +144,9 @@ class Ctrl:
         self.request("TERMINATE")
         self.close()
 
+    def fileno(self):
+        return self.s.fileno()
+
     def pending(self, timeout=0):
         [r, w, e] = select.select([self.s], [], [], timeout)
         if r:
@@ -144,3 +160,22 @@ class Ctrl:
         except UnicodeDecodeError as e:
             r = res
         return r
+
+    def recv_pending(self):
+        if self.udp:
+            # The UDP socket has a timeout set, so a non-blocking receive
+            # would still wait for it.
+            res = []
+            while self.pending():
+                res.append(self.recv())
+            return res
+        res = []
+        while True:
+            try:
+                data = self.s.recv(4096, socket.MSG_DONTWAIT)
+            except socket.error as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+            res.append(data.decode())
+        return res